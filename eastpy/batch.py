@@ -0,0 +1,56 @@
+from __future__ import absolute_import, print_function, division
+
+import numpy as np
+
+from typing import Callable, Sequence
+
+from .movies import ExampleMovie, Movie, MovieFinder
+
+__author__ = 'Andrew Elgert, James Ladd'
+__credits__ = ['Andrew Elgert', 'James Ladd']
+
+
+class BatchMovieFinder(MovieFinder):
+    """
+    Movie finder for large catalogs
+
+    Titles and director ids are stored as columns; movies are only created for the rows an action is applied to.
+    """
+    __slots__ = ('_titles', '_director_ids', '_directors', '_director_index')
+
+    def __init__(self, titles: Sequence[str], directors: Sequence[str]):
+        if len(titles) != len(directors):
+            raise ValueError('Got {} titles but {} directors'.format(len(titles), len(directors)))
+
+        self._director_index = {}
+        self._directors = []
+        director_ids = np.empty(len(directors), dtype=np.int64)
+        for row, director in enumerate(directors):
+            director_id = self._director_index.get(director)
+            if director_id is None:
+                director_id = self._director_index[director] = len(self._directors)
+                self._directors.append(director)
+            director_ids[row] = director_id
+
+        self._titles = np.empty(len(titles), dtype=object)
+        self._titles[:] = list(titles)
+        self._director_ids = director_ids
+
+    def find_all_and_apply(self, selector: Callable[[Movie], None]):
+        for movie in self.iter_all():
+            selector(movie)
+        return self
+
+    def iter_all(self):
+        for title, director_id in zip(self._titles, self._director_ids):
+            yield ExampleMovie(title, director=self._directors[director_id])
+
+    def find_by_director(self, director: str, action: Callable[[Movie], None]):
+        director_id = self._director_index.get(director)
+        if director_id is None:
+            return self
+
+        director = self._directors[director_id]
+        for title in self._titles[self._director_ids == director_id]:
+            action(ExampleMovie(title, director=director))
+        return self
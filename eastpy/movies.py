@@ -1,32 +1,78 @@
 from __future__ import absolute_import, print_function, division
 
-import abc
+import os
 import sys
-import json
+import weakref
+from functools import lru_cache
 
 import attr
-from attr import asdict
 
-from typing import Callable, IO, cast
+from typing import Callable, Dict, IO, Iterable, List, Optional, cast
+
+try:
+    import orjson
+
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+
+    _dumps_bytes = orjson.dumps
+except ImportError:
+    import json
+
+    def _dumps(obj) -> str:
+        # Match orjson, which writes non-ASCII characters as UTF-8 rather than \u escapes
+        return json.dumps(obj, ensure_ascii=False)
+
+    def _dumps_bytes(obj) -> bytes:
+        return _dumps(obj).encode()
 
 __author__ = 'Andrew Elgert, James Ladd'
 __credits__ = ['Andrew Elgert', 'James Ladd']
 
+# Directors repeat across a catalog, so their escaped JSON form is worth caching; titles mostly do not.
+# Only exact str directors are cached, anything else (possibly unhashable) goes straight to the encoder.
+_dumps_cached = lru_cache(maxsize=1024)(_dumps)
+_dumps_bytes_cached = lru_cache(maxsize=1024)(_dumps_bytes)
+
+
+def _simple_string_movie(title: str, director: str) -> str:
+    return 'Movie (title: %s, director: %s)\n' % (title, director)
+
+
+def _json_movie(title: str, director: str) -> str:
+    """Serialize a movie as a JSON object without going through a generic dict encoder"""
+    director = _dumps_cached(director) if type(director) is str else _dumps(director)
+    return '{"title":' + _dumps(title) + ',"director":' + director + '}'
+
 
-@attr.s
+def _json_movie_bytes(title: str, director: str) -> bytes:
+    """Serialize a movie as UTF-8 encoded JSON object"""
+    director = _dumps_bytes_cached(director) if type(director) is str else _dumps_bytes(director)
+    return b'{"title":' + _dumps_bytes(title) + b',"director":' + director + b'}'
+
+
+@attr.s(slots=True)
 class MovieValue(object):
     title = attr.ib(default='')
     director = attr.ib(default='')
 
 
-class Movie(metaclass=abc.ABCMeta):
-    @abc.abstractmethod
+class Movie(object):
+    __slots__ = ()
+
     def if_directed_by_do(self, director: str, action: Callable[['Movie'], None]) -> 'Movie':
         """Perform :action if movie directed by :director"""
+        raise NotImplementedError
+
+    def matches_director(self, director: str) -> bool:
+        """Answer whether movie is directed by :director"""
+        matches = []
+        self.if_directed_by_do(director, matches.append)
+        return bool(matches)
 
-    @abc.abstractmethod
     def if_title_do(self, title: str, action: Callable[['Movie'], None]) -> 'Movie':
         """Perform :action if movie title is :title"""
+        raise NotImplementedError
 
     def print_on_with_format(self, stream: IO[str], formatter: 'MovieFormatter') -> 'Movie':
         """
@@ -36,121 +82,189 @@ class Movie(metaclass=abc.ABCMeta):
         """
         return self.format_with(formatter).print_on(stream)
 
-    @abc.abstractmethod
+    def print_fields_on(self, formatter: 'MovieFormatter', stream: IO[str]) -> 'Movie':
+        """Format movie with :formatter and print onto :stream"""
+        self.format_with(formatter).print_on(stream)
+        return self
+
     def format_with(self, formatter: 'MovieFormatter'):
         """Format movie with :formatter"""
+        raise NotImplementedError
 
-    @abc.abstractmethod
     def print_on(self, stream: IO[str]):
         """Print movie onto :stream"""
+        raise NotImplementedError
 
     # TODO: Smell. Refactor to have "MoviePrinter" take care of formatting + printing using factories
-    @abc.abstractmethod
     def set_format(self, formatted_movie: str) -> 'Movie':
         """Tell movie its formatted output"""
+        raise NotImplementedError
+
 
+class MovieFormatter(object):
+    __slots__ = ()
 
-class MovieFormatter(metaclass=abc.ABCMeta):
-    @abc.abstractmethod
     def format_and_print_on(self, movie: MovieValue, stream: IO[str]) -> 'MovieFormatter':
         """
         Format :movie and print onto :stream
 
-        Deprecated: don't use
+        Deprecated in favor of format_and_print_fields(title, director, stream)
         """
+        return self.format_and_print_fields(movie.title, movie.director, stream)
+
+    def format_and_print_fields(self, title: str, director: str, stream: IO[str]) -> 'MovieFormatter':
+        """Format movie :title and :director and print onto :stream"""
+        # Formatters written before this method existed only provide format_and_print_on
+        if type(self).format_and_print_on is MovieFormatter.format_and_print_on:
+            raise NotImplementedError
+        return self.format_and_print_on(MovieValue(title=title, director=director), stream)
 
-    @abc.abstractmethod
     def format(self, movie: Movie, title: str, director: str) -> 'MovieFormatter':
         """Format :movie and print onto :stream"""
+        raise NotImplementedError
 
 
-class MovieFinder(metaclass=abc.ABCMeta):
-    @abc.abstractmethod
+class MovieFinder(object):
+    __slots__ = ()
+
     def find_all_and_apply(self, action: Callable[[Movie], None]) -> 'MovieFinder':
         """Find all movies and apply :action"""
+        raise NotImplementedError
+
+    def iter_all(self) -> Iterable[Movie]:
+        """Iterate over all movies; by default they are collected through find_all_and_apply first"""
+        movies = []
+        self.find_all_and_apply(movies.append)
+        return iter(movies)
+
+    def find_by_director(self, director: str, action: Callable[[Movie], None]) -> 'MovieFinder':
+        """Find movies directed by :director and apply :action"""
+        if type(self).iter_all is MovieFinder.iter_all:
+            # Stream finders that only provide find_all_and_apply instead of collecting their whole catalog
+            return self.find_all_and_apply(lambda movie: movie.if_directed_by_do(director, action))
+
+        for movie in self.iter_all():
+            if movie.matches_director(director):
+                action(movie)
+        return self
 
 
-class MovieLister(metaclass=abc.ABCMeta):
-    @abc.abstractmethod
+class MovieLister(object):
+    __slots__ = ()
+
     def apply_to_movies_directed_by(self, action: Callable[[Movie], None], director: str) -> 'MovieLister':
         """Execute :action on movies directed by by :director"""
+        raise NotImplementedError
+
 
+class MoviesClient(object):
+    __slots__ = ()
 
-class MoviesClient(metaclass=abc.ABCMeta):
-    @abc.abstractmethod
     def append(self, movie: Movie) -> 'MoviesClient':
         """Append :movie onto stream using :formatter"""
+        raise NotImplementedError
+
+    def extend(self, movies: Iterable[Movie]) -> 'MoviesClient':
+        """Append each of :movies onto stream using :formatter"""
+        for movie in movies:
+            self.append(movie)
+        return self
 
 
 class SimpleStringMovieFormatter(MovieFormatter):
     # TODO: formatter should get data at create time without leaking it out; refactor to use __init__ and a factory
+    __slots__ = ()
+
     def format(self, movie: Movie, title: str, director: str) -> 'MovieFormatter':
         movie.set_format(self._create_formatted_movie(title, director))
         return self
 
-    def format_and_print_on(self, movie: MovieValue, stream: IO[str]):
-        stream.write(self._create_formatted_movie(movie.title, movie.director))
+    def format_and_print_fields(self, title: str, director: str, stream: IO[str]):
+        stream.write(self._create_formatted_movie(title, director))
         return self
 
-    def _create_formatted_movie(self, title: str, director: str) -> str:
-        return 'Movie (title: {}, director: {})\n'.format(title, director)
+    _create_formatted_movie = staticmethod(_simple_string_movie)
 
 
 class JSONMovieFormatter(MovieFormatter):
     # TODO: formatter should get data at create time without leaking it out; refactor to use __init__ and a factory
+    __slots__ = ()
+
     def format(self, movie: Movie, title: str, director: str) -> 'MovieFormatter':
         movie.set_format(self._create_formatted_movie(title, director))
         return self
 
-    def format_and_print_on(self, movie: MovieValue, stream: IO[str]):
-        stream.write(self._create_formatted_movie(**asdict(movie)))
-        stream.write('\n')
+    def format_and_print_fields(self, title: str, director: str, stream: IO[str]):
+        stream.write(self._create_formatted_movie(title, director))
         return self
 
     def _create_formatted_movie(self, title: str, director: str) -> str:
-        return json.dumps({'title': title, 'director': director}) + '\n'
+        return _json_movie(title, director) + '\n'
+
+
+class BinaryJSONMovieFormatter(JSONMovieFormatter):
+    """JSON formatter producing UTF-8 bytes; print onto binary streams such as sys.stdout.buffer"""
+    __slots__ = ()
+
+    def _create_formatted_movie(self, title: str, director: str) -> bytes:
+        return _json_movie_bytes(title, director) + b'\n'
 
 
 class JSONArrayMovieFormatter(MovieFormatter):
     # TODO: formatter should get data at create time without leaking it out; refactor to use __init__ and a factory
+    __slots__ = ('_first', '_stream')
+
     def __init__(self):
-        self._array = []
+        self._first = True
         self._stream = None
 
     def format(self, movie: Movie, title: str, director: str) -> 'MovieFormatter':
-        self._array.append({'title': title, 'director': director})
-        movie.set_format(self._create_formatted_movie())
+        """Format :movie as the next array element; the movie is expected to print it"""
+        movie.set_format(self._create_formatted_movie(self._next_separator(), title, director))
         return self
 
-    def format_and_print_on(self, movie: MovieValue, stream: IO[str]):
+    def format_and_print_fields(self, title: str, director: str, stream: IO[str]):
         if self._stream is None:
             self._stream = stream
-        self._array.append(asdict(movie))
 
-        stream.write(self._create_formatted_movie())
+        stream.write(self._create_formatted_movie('[' if self._first else ',', title, director))
+        self._first = False
         return self
 
-    def collect_and_print(self):
-        if len(self._array) > 0 and self._stream is not None:
-            self._stream.write(self._create_formatted_movie())
+    def collect_and_print(self, stream: Optional[IO[str]] = None):
+        """Close the array on :stream, or on the stream used by format_and_print_fields, and start a new one"""
+        stream = stream if stream is not None else self._stream
+        if not self._first and stream is not None:
+            stream.write(']\n')
+        self._first = True
+        self._stream = None
+
+    def _next_separator(self) -> str:
+        separator = '[' if self._first else ','
+        self._first = False
+        return separator
 
-    def _create_formatted_movie(self) -> str:
-        return json.dumps(self._array) + '\n'
+    def _create_formatted_movie(self, separator: str, title: str, director: str) -> str:
+        return separator + _json_movie(title, director)
 
 
 class ExampleMovieLister(MovieLister):
+    __slots__ = ('_finder',)
+
     def __init__(self, finder: MovieFinder):
         self._finder = finder
 
     def apply_to_movies_directed_by(self, action: Callable[[Movie], None], director: str):
-        self._finder.find_all_and_apply(lambda movie: movie.if_directed_by_do(director, action))
+        self._finder.find_by_director(director, action)
         return self
 
 
 class ExampleMovie(Movie):
+    __slots__ = ('_title', '_director', '_formatted_movie')
+
     def __init__(self, title: str, director: str):
         self._title = title
-        self._director = director
+        self._director = sys.intern(director) if type(director) is str else director
         self._formatted_movie = ''
 
     def if_directed_by_do(self, director: str, action: Callable[[Movie], None]):
@@ -158,6 +272,14 @@ class ExampleMovie(Movie):
             action(self)
         return self
 
+    def matches_director(self, director: str):
+        return self._director == director
+
+    def add_to_director_index(self, index: Dict[str, List[Movie]]):
+        """Add movie to :index under its director"""
+        index.setdefault(self._director, []).append(self)
+        return self
+
     def if_title_do(self, title: str, action: Callable[[Movie], None]):
         if self._title == title:
             action(self)
@@ -171,11 +293,17 @@ class ExampleMovie(Movie):
         formatter.format(self, title=self._title, director=self._director)
         return self
 
+    def print_fields_on(self, formatter: MovieFormatter, stream: IO[str]):
+        formatter.format_and_print_fields(self._title, self._director, stream)
+        return self
+
     def print_on(self, stream: IO[str]):
         stream.write(self._formatted_movie)
 
 
 class ExampleMovieFinder(MovieFinder):
+    __slots__ = ()
+
     _MOVIES = [
         ExampleMovie('Star Wars', director='George Lucas'),
         ExampleMovie('Lost Highway', director='David Lynch'),
@@ -184,13 +312,41 @@ class ExampleMovieFinder(MovieFinder):
         ExampleMovie('The Adventures of Buckaroo Banzai Across the 8th Dimension', director='W.D. Richter'),
         ExampleMovie('Wild At Heart', director='David Lynch'),
     ]
+    # Director index per finder class, so subclasses overriding _MOVIES get their own
+    _INDEXES = {}
 
     def find_all_and_apply(self, selector: Callable[[Movie], None]):
         for movie in self._MOVIES:
             selector(movie)
+        return self
+
+    def iter_all(self):
+        return iter(self._MOVIES)
+
+    def find_by_director(self, director: str, action: Callable[[Movie], None]):
+        for movie in self._director_index().get(director, ()):
+            action(movie)
+        return self
+
+    @classmethod
+    def _director_index(cls) -> Dict[str, List[Movie]]:
+        index = cls._INDEXES.get(cls)
+        if index is None:
+            index = {}
+            for movie in cls._MOVIES:
+                movie.add_to_director_index(index)
+            cls._INDEXES[cls] = index
+        return index
+
+
+def _print_all_on(movies: Iterable[Movie], formatter: MovieFormatter, stream: IO[str]):
+    for movie in movies:
+        movie.print_fields_on(formatter, stream)
 
 
 class ExampleMoviesClientStreamAdaptor(MoviesClient):
+    __slots__ = ('_stream', '_formatter')
+
     def __init__(self, stream: IO[str], formatter: MovieFormatter):
         self._stream = stream
         self._formatter = formatter
@@ -198,32 +354,114 @@ class ExampleMoviesClientStreamAdaptor(MoviesClient):
     def append(self, movie: Movie):
         movie.format_with(self._formatter).print_on(self._stream)
 
+    def extend(self, movies: Iterable[Movie]):
+        _print_all_on(movies, self._formatter, self._stream)
+        return self
+
 
 class ExampleMoviesClientFileAdaptor(MoviesClient):
-    def __init__(self, file_path: str, formatter: MovieFormatter):
-        self._file_path = file_path
+    __slots__ = ('_file', '_formatter')
+
+    def __init__(self, file_path: str, formatter: MovieFormatter, buffering: int = 1 << 20, binary: bool = False):
+        self._file = cast(IO, open(file_path, 'ab' if binary else 'a', buffering=buffering))
         self._formatter = formatter
 
+    def __enter__(self) -> 'ExampleMoviesClientFileAdaptor':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
     def append(self, movie: Movie):
-        with cast(IO[str], open(self._file_path, 'a')) as f:
-            f.truncate()
-            movie.format_with(self._formatter).print_on(f)
+        movie.format_with(self._formatter).print_on(self._file)
+
+    def extend(self, movies: Iterable[Movie]):
+        _print_all_on(movies, self._formatter, self._file)
+        return self
+
+    def close(self):
+        """Flush buffered movies and close the file"""
+        self._file.close()
+
+
+def _write_all(fd: int, buffer: bytearray):
+    while buffer:
+        del buffer[:os.write(fd, buffer)]
+
+
+def _flush_and_close(fd: int, buffer: bytearray):
+    try:
+        _write_all(fd, buffer)
+    finally:
+        os.close(fd)
+
+
+class ExampleMoviesClientBulkFileAdaptor(MoviesClient):
+    """
+    File client that collects encoded movies in memory and hands them to os.write in large chunks
+
+    Call close() or use it as a context manager. Buffered movies left when the client is garbage collected or the
+    interpreter exits are flushed by a finalizer, but errors raised there cannot be handled by the caller.
+    """
+    __slots__ = ('_fd', '_buffer', '_chunk_size', '_formatter', '_finalizer', '__weakref__')
+
+    def __init__(self, file_path: str, formatter: MovieFormatter, chunk_size: int = 1 << 20):
+        self._fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o666)
+        self._buffer = bytearray()
+        self._chunk_size = chunk_size
+        self._formatter = formatter
+        self._finalizer = weakref.finalize(self, _flush_and_close, self._fd, self._buffer)
+
+    def __enter__(self) -> 'ExampleMoviesClientBulkFileAdaptor':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._fd < 0
+
+    def append(self, movie: Movie):
+        movie.format_with(self._formatter).print_on(self)
+
+    def extend(self, movies: Iterable[Movie]):
+        _print_all_on(movies, self._formatter, self)
+        return self
+
+    def write(self, formatted_movie) -> int:
+        """Buffer :formatted_movie, encoding it as UTF-8 if it is text"""
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+        if isinstance(formatted_movie, str):
+            formatted_movie = formatted_movie.encode('utf-8')
+        self._buffer += formatted_movie
+        if len(self._buffer) >= self._chunk_size:
+            self.flush()
+        return len(formatted_movie)
+
+    def flush(self):
+        """Write all buffered movies to the file"""
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+        _write_all(self._fd, self._buffer)
+
+    def close(self):
+        """Flush buffered movies and close the file; does nothing if already closed"""
+        if self.closed:
+            return
+        self._fd = -1
+        self._finalizer()
 
 
 if __name__ == '__main__':
-    ExampleMovieLister(ExampleMovieFinder()).apply_to_movies_directed_by(
-        lambda movie: ExampleMoviesClientStreamAdaptor(sys.stdout, JSONMovieFormatter()).append(movie),
-        'George Lucas'
-    )
-
-    ExampleMovieLister(ExampleMovieFinder()).apply_to_movies_directed_by(
-        (lambda formatter: lambda movie: ExampleMoviesClientStreamAdaptor(sys.stdout, formatter).append(movie))(
-            JSONArrayMovieFormatter()
-        ),
-        'David Lynch'
-    )
-
-    ExampleMovieLister(ExampleMovieFinder()).apply_to_movies_directed_by(
-        lambda movie: ExampleMoviesClientFileAdaptor("../movies.txt", SimpleStringMovieFormatter()).append(movie),
-        'David Lynch'
-    )
+    json_adaptor = ExampleMoviesClientStreamAdaptor(sys.stdout, JSONMovieFormatter())
+    ExampleMovieLister(ExampleMovieFinder()).apply_to_movies_directed_by(json_adaptor.append, 'George Lucas')
+
+    array_formatter = JSONArrayMovieFormatter()
+    array_adaptor = ExampleMoviesClientStreamAdaptor(sys.stdout, array_formatter)
+    ExampleMovieLister(ExampleMovieFinder()).apply_to_movies_directed_by(array_adaptor.append, 'David Lynch')
+    array_formatter.collect_and_print(sys.stdout)
+
+    with ExampleMoviesClientFileAdaptor("../movies.txt", SimpleStringMovieFormatter()) as file_adaptor:
+        ExampleMovieLister(ExampleMovieFinder()).apply_to_movies_directed_by(file_adaptor.append, 'David Lynch')
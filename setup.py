@@ -15,10 +15,15 @@ with open('HISTORY.rst') as history_file:
     history = history_file.read().replace('.. :changelog:', '')
 
 requirements = [
-    'attrs>=15.0.0',
+    'attrs>=16.0.0',
     'typing>=3.5.0',
 ]
 
+extras_requirements = {
+    'fast': ['orjson>=3.0.0'],
+    'batch': ['numpy>=1.17.0'],
+}
+
 test_requirements = [
 ]
 
@@ -38,6 +43,7 @@ setup(
     },
     include_package_data=True,
     install_requires=requirements,
+    extras_require=extras_requirements,
     license="BSD",
     zip_safe=False,
     keywords='eastpy',
@@ -8,10 +8,22 @@ test_eastpy
 Tests for `eastpy` module.
 """
 
+import io
+import gc
+import json
+import os
+import sys
+import tempfile
 import unittest
 
 from eastpy import movies
 
+try:
+    import numpy as np
+    from eastpy import batch
+except ImportError:
+    np = batch = None
+
 
 class TestEastpy(unittest.TestCase):
 
@@ -23,3 +35,407 @@ class TestEastpy(unittest.TestCase):
 
     def tearDown(self):
         pass
+
+
+class TestJSONArrayMovieFormatter(unittest.TestCase):
+
+    def setUp(self):
+        self.stream = io.StringIO()
+        self.formatter = movies.JSONArrayMovieFormatter()
+        self.client = movies.ExampleMoviesClientStreamAdaptor(self.stream, self.formatter)
+
+    def test_collect_and_print_closes_array(self):
+        movies.ExampleMovieLister(movies.ExampleMovieFinder()).apply_to_movies_directed_by(
+            self.client.append, 'David Lynch'
+        )
+        self.formatter.collect_and_print(self.stream)
+
+        self.assertEqual(
+            [movie['title'] for movie in json.loads(self.stream.getvalue())],
+            ['Lost Highway', 'Mulholland Dr', 'Wild At Heart']
+        )
+
+    def test_format_and_print_fields_closes_array_on_same_stream(self):
+        self.formatter.format_and_print_fields('Eraserhead', 'David Lynch', self.stream)
+        self.formatter.format_and_print_fields('Dune', 'David Lynch', self.stream)
+        self.formatter.collect_and_print()
+
+        self.assertEqual(json.loads(self.stream.getvalue()), [
+            {'title': 'Eraserhead', 'director': 'David Lynch'},
+            {'title': 'Dune', 'director': 'David Lynch'},
+        ])
+
+    def test_collect_and_print_starts_new_array(self):
+        self.formatter.format_and_print_fields('Eraserhead', 'David Lynch', self.stream)
+        self.formatter.collect_and_print()
+        self.formatter.collect_and_print(self.stream)
+        self.formatter.format_and_print_fields('Dune', 'David Lynch', self.stream)
+        self.formatter.collect_and_print()
+
+        self.assertEqual(
+            [json.loads(line) for line in self.stream.getvalue().splitlines()],
+            [[{'title': 'Eraserhead', 'director': 'David Lynch'}], [{'title': 'Dune', 'director': 'David Lynch'}]]
+        )
+
+    def test_collect_and_print_without_movies_prints_nothing(self):
+        self.formatter.collect_and_print(self.stream)
+
+        self.assertEqual(self.stream.getvalue(), '')
+
+
+class TestExampleMoviesClientFileAdaptor(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp()
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_appends_to_existing_file(self):
+        for director in ('George Lucas', 'David Cronenberg'):
+            with movies.ExampleMoviesClientFileAdaptor(self.path, movies.SimpleStringMovieFormatter()) as client:
+                movies.ExampleMovieLister(movies.ExampleMovieFinder()).apply_to_movies_directed_by(
+                    client.append, director
+                )
+
+        with open(self.path) as f:
+            self.assertEqual(f.read(), (
+                'Movie (title: Star Wars, director: George Lucas)\n'
+                'Movie (title: Naked Lunch, director: David Cronenberg)\n'
+            ))
+
+    def test_close_twice(self):
+        client = movies.ExampleMoviesClientFileAdaptor(self.path, movies.SimpleStringMovieFormatter())
+        client.close()
+        client.close()
+
+
+class TestJSONMovieFormatter(unittest.TestCase):
+
+    def test_prints_one_object_per_line(self):
+        stream = io.StringIO()
+        client = movies.ExampleMoviesClientStreamAdaptor(stream, movies.JSONMovieFormatter())
+        movies.ExampleMovieLister(movies.ExampleMovieFinder()).apply_to_movies_directed_by(client.append, 'David Lynch')
+
+        self.assertEqual(stream.getvalue(), (
+            '{"title":"Lost Highway","director":"David Lynch"}\n'
+            '{"title":"Mulholland Dr","director":"David Lynch"}\n'
+            '{"title":"Wild At Heart","director":"David Lynch"}\n'
+        ))
+
+    def test_escapes_strings(self):
+        stream = io.StringIO()
+        movies.JSONMovieFormatter().format_and_print_fields('8\u00bd "Otto e mezzo"', 'Federico Fellini', stream)
+
+        self.assertEqual(stream.getvalue(), '{"title":"8\u00bd \\"Otto e mezzo\\"","director":"Federico Fellini"}\n')
+        self.assertEqual(
+            json.loads(stream.getvalue()), {'title': '8\u00bd "Otto e mezzo"', 'director': 'Federico Fellini'}
+        )
+
+    def test_unhashable_director(self):
+        stream, binary_stream = io.StringIO(), io.BytesIO()
+        movies.JSONMovieFormatter().format_and_print_fields('Fargo', ['Joel Coen', 'Ethan Coen'], stream)
+        movies.BinaryJSONMovieFormatter().format_and_print_fields('Fargo', ['Joel Coen', 'Ethan Coen'], binary_stream)
+
+        self.assertEqual(json.loads(stream.getvalue()), {'title': 'Fargo', 'director': ['Joel Coen', 'Ethan Coen']})
+        self.assertEqual(binary_stream.getvalue().decode('utf-8'), stream.getvalue())
+
+    def test_binary_formatter_prints_utf8_bytes(self):
+        stream = io.BytesIO()
+        movies.BinaryJSONMovieFormatter().format_and_print_fields('8\u00bd', 'Federico Fellini', stream)
+
+        self.assertEqual(stream.getvalue(), '{"title":"8\u00bd","director":"Federico Fellini"}\n'.encode('utf-8'))
+
+
+class BaselineMovie(movies.Movie):
+    """Movie implementing only the original interface"""
+
+    def __init__(self, title, director):
+        self.title = title
+        self.director = director
+
+    def if_directed_by_do(self, director, action):
+        if self.director == director:
+            action(self)
+        return self
+
+
+class BaselineMovieFinder(movies.MovieFinder):
+    """Finder implementing only the original interface"""
+
+    def __init__(self):
+        self.events = []
+
+    def find_all_and_apply(self, action):
+        for movie in (BaselineMovie('Blue Velvet', 'David Lynch'), BaselineMovie('Videodrome', 'David Cronenberg')):
+            self.events.append('found ' + movie.title)
+            action(movie)
+        return self
+
+
+class TestMovieFinder(unittest.TestCase):
+
+    def test_baseline_finder_and_movies(self):
+        found = []
+        movies.ExampleMovieLister(BaselineMovieFinder()).apply_to_movies_directed_by(found.append, 'David Lynch')
+
+        self.assertEqual([movie.title for movie in found], ['Blue Velvet'])
+
+    def test_baseline_finder_is_streamed(self):
+        finder = BaselineMovieFinder()
+        finder.find_by_director('David Lynch', lambda movie: finder.events.append('applied ' + movie.title))
+
+        self.assertEqual(finder.events, ['found Blue Velvet', 'applied Blue Velvet', 'found Videodrome'])
+
+    def test_baseline_movie_matches_director(self):
+        movie = BaselineMovie('Blue Velvet', 'David Lynch')
+
+        self.assertTrue(movie.matches_director('David Lynch'))
+        self.assertFalse(movie.matches_director('David Cronenberg'))
+
+
+@unittest.skipIf(batch is None, 'numpy is not installed')
+class TestBatchMovieFinder(unittest.TestCase):
+
+    def setUp(self):
+        self.finder = batch.BatchMovieFinder(
+            np.array(['Eraserhead', 'Videodrome', 'Dune', 'The Fly']),
+            np.array(['David Lynch', 'David Cronenberg', 'David Lynch', 'David Cronenberg'])
+        )
+
+    def print_directed_by(self, director):
+        stream = io.StringIO()
+        client = movies.ExampleMoviesClientStreamAdaptor(stream, movies.SimpleStringMovieFormatter())
+        movies.ExampleMovieLister(self.finder).apply_to_movies_directed_by(client.append, director)
+        return stream.getvalue()
+
+    def test_find_by_director(self):
+        self.assertEqual(self.print_directed_by('David Cronenberg'), (
+            'Movie (title: Videodrome, director: David Cronenberg)\n'
+            'Movie (title: The Fly, director: David Cronenberg)\n'
+        ))
+
+    def test_find_by_unknown_director(self):
+        self.assertEqual(self.print_directed_by('George Lucas'), '')
+
+    def test_find_all_and_apply(self):
+        stream = io.StringIO()
+        client = movies.ExampleMoviesClientStreamAdaptor(stream, movies.JSONMovieFormatter())
+        self.finder.find_all_and_apply(client.append)
+
+        self.assertEqual(
+            [json.loads(line)['title'] for line in stream.getvalue().splitlines()],
+            ['Eraserhead', 'Videodrome', 'Dune', 'The Fly']
+        )
+
+    def test_values_are_kept(self):
+        finder = batch.BatchMovieFinder(['Untitled', 'None'], [None, 'None'])
+        found = []
+        finder.find_by_director(None, lambda movie: movie.if_title_do('Untitled', found.append))
+        finder.find_by_director('None', lambda movie: movie.if_title_do('None', found.append))
+
+        self.assertEqual(len(found), 2)
+
+    def test_mismatched_columns(self):
+        with self.assertRaises(ValueError):
+            batch.BatchMovieFinder(['Eraserhead'], ['David Lynch', 'David Cronenberg'])
+
+
+class TestExampleMovieFinder(unittest.TestCase):
+
+    def test_find_by_director_repeats_results(self):
+        finder = movies.ExampleMovieFinder()
+        found = []
+        finder.find_by_director('David Lynch', found.append)
+        finder.find_by_director('David Lynch', found.append)
+        finder.find_by_director('Nobody', found.append)
+
+        self.assertEqual(len(found), 6)
+        self.assertEqual(found[:3], found[3:])
+
+    def test_index_is_shared_and_skips_misses(self):
+        movies.ExampleMovieFinder().find_by_director('David Lynch', lambda movie: None)
+        index = movies.ExampleMovieFinder._INDEXES[movies.ExampleMovieFinder]
+        movies.ExampleMovieFinder().find_by_director('Nobody', lambda movie: None)
+
+        self.assertIs(movies.ExampleMovieFinder._INDEXES[movies.ExampleMovieFinder], index)
+        self.assertNotIn('Nobody', index)
+
+    def test_subclass_catalog(self):
+        class MyMovieFinder(movies.ExampleMovieFinder):
+            _MOVIES = [movies.ExampleMovie('Dune', director='David Lynch')]
+
+        stream = io.StringIO()
+        client = movies.ExampleMoviesClientStreamAdaptor(stream, movies.SimpleStringMovieFormatter())
+        # Build the parent's index first; the subclass must not reuse it
+        movies.ExampleMovieFinder().find_by_director('David Lynch', lambda movie: None)
+        movies.ExampleMovieLister(MyMovieFinder()).apply_to_movies_directed_by(client.append, 'David Lynch')
+
+        self.assertEqual(stream.getvalue(), 'Movie (title: Dune, director: David Lynch)\n')
+
+
+class TestSimpleStringMovieFormatter(unittest.TestCase):
+
+    def test_formats_non_string_fields(self):
+        stream = io.StringIO()
+        movies.SimpleStringMovieFormatter().format_and_print_fields(1984, None, stream)
+
+        self.assertEqual(stream.getvalue(), 'Movie (title: 1984, director: None)\n')
+
+
+class PrintOnlyMovie(movies.Movie):
+    """Movie that formats itself only through format_with/print_on"""
+
+    def __init__(self, title, director):
+        self.title = title
+        self.director = director
+        self.formatted_movie = ''
+
+    def set_format(self, formatted_movie):
+        self.formatted_movie = formatted_movie
+        return self
+
+    def format_with(self, formatter):
+        formatter.format(self, self.title, self.director)
+        return self
+
+    def print_on(self, stream):
+        stream.write(self.formatted_movie)
+
+
+class LegacyFormatter(movies.MovieFormatter):
+    """Formatter implementing only the original interface"""
+
+    def format(self, movie, title, director):
+        movie.set_format('{} by {}\n'.format(title, director))
+        return self
+
+    def format_and_print_on(self, movie, stream):
+        stream.write('{} by {}\n'.format(movie.title, movie.director))
+        return self
+
+
+class TestMoviesClientExtend(unittest.TestCase):
+
+    def test_extend_matches_append(self):
+        appended, extended = io.StringIO(), io.StringIO()
+        movies.ExampleMovieFinder().find_all_and_apply(
+            movies.ExampleMoviesClientStreamAdaptor(appended, movies.JSONMovieFormatter()).append
+        )
+        movies.ExampleMoviesClientStreamAdaptor(extended, movies.JSONMovieFormatter()).extend(
+            movies.ExampleMovieFinder().iter_all()
+        )
+
+        self.assertEqual(extended.getvalue(), appended.getvalue())
+        self.assertEqual(len(extended.getvalue().splitlines()), 6)
+
+    def test_extend_other_movies(self):
+        stream = io.StringIO()
+        formatter = movies.JSONArrayMovieFormatter()
+        movies.ExampleMoviesClientStreamAdaptor(stream, formatter).extend([
+            movies.ExampleMovie('Eraserhead', director='David Lynch'),
+            PrintOnlyMovie('Dune', 'David Lynch'),
+        ])
+        formatter.collect_and_print(stream)
+
+        self.assertEqual(json.loads(stream.getvalue()), [
+            {'title': 'Eraserhead', 'director': 'David Lynch'},
+            {'title': 'Dune', 'director': 'David Lynch'},
+        ])
+
+    def test_extend_with_legacy_formatter(self):
+        appended, extended = io.StringIO(), io.StringIO()
+        movies.ExampleMovieFinder().find_all_and_apply(
+            movies.ExampleMoviesClientStreamAdaptor(appended, LegacyFormatter()).append
+        )
+        movies.ExampleMoviesClientStreamAdaptor(extended, LegacyFormatter()).extend(
+            movies.ExampleMovieFinder().iter_all()
+        )
+
+        self.assertEqual(extended.getvalue(), appended.getvalue())
+        self.assertTrue(extended.getvalue().startswith('Star Wars by George Lucas\n'))
+
+    def test_formatter_without_print_methods(self):
+        with self.assertRaises(NotImplementedError):
+            movies.MovieFormatter().format_and_print_fields('Dune', 'David Lynch', io.StringIO())
+
+
+class TestExampleMoviesClientBulkFileAdaptor(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp()
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def test_flushes_at_chunk_size_and_on_close(self):
+        line = b'{"title":"Star Wars","director":"George Lucas"}\n'
+        client = movies.ExampleMoviesClientBulkFileAdaptor(
+            self.path, movies.BinaryJSONMovieFormatter(), chunk_size=len(line) + 1
+        )
+        movie = movies.ExampleMovie('Star Wars', director='George Lucas')
+
+        client.append(movie)
+        self.assertEqual(self.read(), b'')
+        client.append(movie)
+        self.assertEqual(self.read(), line * 2)
+        client.append(movie)
+        client.close()
+        self.assertEqual(self.read(), line * 3)
+
+    def test_encodes_text(self):
+        with movies.ExampleMoviesClientBulkFileAdaptor(self.path, movies.SimpleStringMovieFormatter()) as client:
+            client.extend([movies.ExampleMovie('8\u00bd', director='Federico Fellini')])
+
+        self.assertEqual(self.read(), 'Movie (title: 8\u00bd, director: Federico Fellini)\n'.encode('utf-8'))
+
+    def test_close_twice_leaves_other_files_open(self):
+        with movies.ExampleMoviesClientBulkFileAdaptor(self.path, movies.SimpleStringMovieFormatter()) as client:
+            pass
+        with open(self.path, 'a') as other:
+            client.close()
+            other.write('still open')
+
+        self.assertTrue(client.closed)
+        self.assertEqual(self.read(), b'still open')
+
+    def test_write_after_close(self):
+        client = movies.ExampleMoviesClientBulkFileAdaptor(self.path, movies.SimpleStringMovieFormatter())
+        client.close()
+
+        with self.assertRaises(ValueError):
+            client.append(movies.ExampleMovie('Star Wars', director='George Lucas'))
+
+    def test_flushes_when_collected(self):
+        client = movies.ExampleMoviesClientBulkFileAdaptor(self.path, movies.SimpleStringMovieFormatter())
+        client.append(movies.ExampleMovie('Star Wars', director='George Lucas'))
+        del client
+        gc.collect()
+
+        self.assertEqual(self.read(), b'Movie (title: Star Wars, director: George Lucas)\n')
+
+
+class TestExampleMovie(unittest.TestCase):
+
+    def test_director_is_interned(self):
+        director = ''.join(['David ', 'Lynch'])
+
+        self.assertIs(movies.ExampleMovie('Dune', director=director)._director, sys.intern(director))
+
+    def test_director_not_a_str(self):
+        found = []
+        movies.ExampleMovie('Untitled', director=None).if_directed_by_do(None, found.append)
+
+        self.assertEqual(len(found), 1)
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_director_numpy_str(self):
+        movie = movies.ExampleMovie('Dune', director=np.array(['David Lynch'])[0])
+
+        self.assertTrue(movie.matches_director('David Lynch'))